@@ -1,7 +1,38 @@
 # app/agents.py
-from typing import List, Dict, Optional
+from typing import Callable, Hashable, Iterable, List, Dict, Optional
+from collections import Counter
+from operator import itemgetter
+import os
 import re
 
+# -------------------------
+# Precompiled patterns
+# -------------------------
+_JS_STMT_PREFIXES = ("var ", "let ", "const ", "return ", "console.")
+_JS_PAREN_KEYWORDS = ("if", "for")
+_JS_DECL = re.compile(r"\b(?:let|const|var)\s+([A-Za-z_\$][A-Za-z0-9_\$]*)")
+_EMPTY_GETELEM = re.compile(r"getElementById\s*\(\s*['\"]\s*['\"]\s*\)")
+_INNERHTML = re.compile(r"\.innerHTML\s*=")
+_TOP_LOOP = re.compile(r"^\s*(for\s*\(|while\s*\()", re.MULTILINE)
+_INLINE_EVT = re.compile(r"on\w+\s*=")
+_SCRIPT_TAG = re.compile(r"<script\b[^>]*>", re.IGNORECASE)
+_FASTAPI = re.compile(r"\bapp\s*=\s*FastAPI\(")
+_FASTAPI_ASSIGN = re.compile(r"app\s*=\s*FastAPI\(")
+_EVAL_EXEC = re.compile(r"\beval\(|\bexec\(")
+_DEF = re.compile(r"^\s*def\s+\w+\s*\(.*\):", re.MULTILINE)
+# cheap substring prefilters: a regex only runs when its literal is present
+_SECRET_KEYWORDS = ("api_key", "apikey", "secret", "password")
+_SECRET = re.compile(r"(api_key|apiKey|secret|password)\s*[:=]\s*['\"][A-Za-z0-9_\-]{6,}['\"]", re.IGNORECASE)
+# concatenated (case-insensitive) or f-string interpolated SQL, one pass
+_SQL_CONCAT = re.compile(r"(?i:SELECT .* \+ .*)|f\".*SELECT.*\{.*\}.*\"")
+_DOM_Q = re.compile(r"\b(getElementById|querySelector(All)?)\(")
+_NESTED = re.compile(r"for .*:\n\s+for .*:")
+_TEST_FILE = re.compile(r"(test_|_test|tests?/)", re.IGNORECASE)
+_LOGIC = re.compile(r"\b(?:if|else|return|for|while|try|except)\b")
+_FN = re.compile(r"\bdef\s+\w+\(|function\s+\w+|\w+\s*=\s*\(.*\)\s*=>")
+_DB = re.compile(r"(cursor\.execute|db\.|insert|update|delete|save\()", re.IGNORECASE)
+_API = re.compile(r"\b(fetch|axios|requests\.)\b")
+
 # -------------------------
 # Utilities
 # -------------------------
@@ -26,24 +57,57 @@ def _make_finding(file: str,
         "source": source or []
     }
 
+def dedupe_findings(items: Iterable[Dict], keyfn: Callable[[Dict], Hashable]) -> List[Dict]:
+    """
+    Keep the first finding per key, preserving order. Shared by analyze_hunk
+    and the orchestrator's global merge.
+    """
+    by_key: Dict[Hashable, Dict] = {}
+    for it in items:
+        k = keyfn(it)
+        if k not in by_key:
+            by_key[k] = it
+    return list(by_key.values())
+
+def _looks_like_js_statement(t: str) -> bool:
+    # str-only equivalent of ^(var |let |const |return |console\.|if\s*\(|for\s*\()
+    if t.startswith(_JS_STMT_PREFIXES):
+        return True
+    for kw in _JS_PAREN_KEYWORDS:
+        if t.startswith(kw) and t[len(kw):].lstrip().startswith("("):
+            return True
+    return False
+
 def _normalize_file(path: str) -> str:
     return (path or "").lower()
 
+_EXT2LANG = {
+    ".html": "html", ".htm": "html",
+    ".js": "js", ".jsx": "js", ".mjs": "js", ".ts": "js", ".tsx": "js",
+    ".py": "py",
+    ".css": "css",
+    ".json": "config", ".yaml": "config", ".yml": "config",
+    ".md": "md", ".markdown": "md",
+}
+
 def detect_language(file_path: str) -> str:
     f = _normalize_file(file_path)
-    if f.endswith((".html", ".htm")):
-        return "html"
-    if f.endswith((".js", ".jsx", ".mjs", ".ts", ".tsx")):
-        return "js"
-    if f.endswith((".py",)):
-        return "py"
-    if f.endswith((".css",)):
-        return "css"
-    if f.endswith((".json", ".yaml", ".yml")):
-        return "config"
-    if f.endswith((".md", ".markdown")):
-        return "md"
-    return "other"
+    # bare dotfiles (".py", "dir/.md") have no splitext extension; use the basename
+    ext = os.path.splitext(f)[1] or os.path.basename(f)
+    return _EXT2LANG.get(ext, "other")
+
+def _hunk_text(hunk: Dict) -> str:
+    # joined added lines, computed once per hunk and shared by all agents
+    text = hunk.get("_added_text")
+    if text is None:
+        text = hunk["_added_text"] = "\n".join(hunk.get("added", []))
+    return text
+
+def _hunk_lang(hunk: Dict) -> str:
+    lang = hunk.get("_lang")
+    if lang is None:
+        lang = hunk["_lang"] = detect_language(hunk.get("file"))
+    return lang
 
 # -------------------------
 # Syntax / Style Agent
@@ -51,7 +115,7 @@ def detect_language(file_path: str) -> str:
 def syntax_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    lang = detect_language(file)
+    lang = _hunk_lang(hunk)
     added = hunk.get("added", [])
     start = hunk.get("start", 1)
 
@@ -67,18 +131,19 @@ def syntax_agent(hunk: Dict) -> List[Dict]:
                 severity="low", confidence=0.45, category="style", source=["syntax_agent"]
             ))
         # overly long lines
-        if len(line) > 120:
+        line_len = len(line)
+        if line_len > 120:
             findings.append(_make_finding(
                 file, lineno,
                 "Long line (>120 chars)",
-                f"Line length is {len(line)} characters which reduces readability.",
+                f"Line length is {line_len} characters which reduces readability.",
                 "Wrap long expressions or extract logic into helper functions. Run code formatters.",
                 severity="low", confidence=0.5, category="style", source=["syntax_agent"]
             ))
         # JS missing semicolon heuristic
         if lang == "js":
             t = line.strip()
-            if t and re.match(r"^(var |let |const |return |console\.|if\s*\(|for\s*\()", t) and not t.endswith(";") and not t.endswith("{") and not t.endswith("}"):
+            if t and _looks_like_js_statement(t) and not t.endswith((";", "{", "}")):
                 findings.append(_make_finding(
                     file, lineno,
                     "Possible missing semicolon",
@@ -94,13 +159,12 @@ def syntax_agent(hunk: Dict) -> List[Dict]:
 def js_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added = "\n".join(hunk.get("added", []))
+    added = _hunk_text(hunk)
     start = hunk.get("start", 1)
 
     # duplicate declarations
-    names = re.findall(r"\b(?:let|const|var)\s+([A-Za-z_\$][A-Za-z0-9_\$]*)", added)
-    for n in set(names):
-        if names.count(n) > 1:
+    for n, c in Counter(_JS_DECL.findall(added)).items():
+        if c > 1:
             findings.append(_make_finding(
                 file, start,
                 "Duplicate variable declaration",
@@ -111,7 +175,7 @@ def js_agent(hunk: Dict) -> List[Dict]:
 
     # React createRoot / DOM ID issues
     if "createRoot" in added or "ReactDOM.render" in added:
-        if re.search(r"getElementById\(['\"]\s*['\"]\)", added) or re.search(r"getElementById\(['\"]\s*['\"]\)", added.replace(" ", "")):
+        if _EMPTY_GETELEM.search(added):
             findings.append(_make_finding(
                 file, start,
                 "Invalid DOM selector in React mount",
@@ -121,7 +185,7 @@ def js_agent(hunk: Dict) -> List[Dict]:
             ))
 
     # direct DOM innerHTML
-    if re.search(r"\.innerHTML\s*=", added):
+    if "innerHTML" in added and _INNERHTML.search(added):
         findings.append(_make_finding(
             file, start,
             "Direct use of innerHTML",
@@ -131,7 +195,7 @@ def js_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # heavy loops on top-level
-    if re.search(r"^\s*(for\s*\(|while\s*\()", added, flags=re.MULTILINE):
+    if ("for" in added or "while" in added) and _TOP_LOOP.search(added):
         findings.append(_make_finding(
             file, start,
             "Potential expensive top-level loop",
@@ -148,7 +212,7 @@ def js_agent(hunk: Dict) -> List[Dict]:
 def html_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added = "\n".join(hunk.get("added", []))
+    added = _hunk_text(hunk)
     start = hunk.get("start", 1)
 
     # missing alt attributes
@@ -162,7 +226,7 @@ def html_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # inline event handlers
-    if re.search(r"on\w+\s*=", added):
+    if _INLINE_EVT.search(added):
         findings.append(_make_finding(
             file, start,
             "Inline event handler used",
@@ -172,7 +236,7 @@ def html_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # blocking script tags detection
-    script_tags = re.findall(r"<script\b[^>]*>", added, flags=re.IGNORECASE)
+    script_tags = _SCRIPT_TAG.findall(added)
     for tag in script_tags:
         if "async" not in tag.lower() and "defer" not in tag.lower() and 'type="module"' not in tag.lower():
             findings.append(_make_finding(
@@ -191,13 +255,13 @@ def html_agent(hunk: Dict) -> List[Dict]:
 def py_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added = "\n".join(hunk.get("added", []))
+    added = _hunk_text(hunk)
     start = hunk.get("start", 1)
 
     # duplicate FastAPI app init (common in your repo)
-    if "FastAPI(" in added and re.search(r"\bapp\s*=\s*FastAPI\(", added):
+    if "FastAPI(" in added and _FASTAPI.search(added):
         # If file contains the initialization multiple times in added lines
-        if added.count("FastAPI(") > 1 or re.search(r"app\s*=\s*FastAPI\(", added) and "app =" in added and added.count("app =") > 1:
+        if added.count("FastAPI(") > 1 or _FASTAPI_ASSIGN.search(added) and "app =" in added and added.count("app =") > 1:
             findings.append(_make_finding(
                 file, start,
                 "Duplicate FastAPI() initialization",
@@ -217,7 +281,7 @@ def py_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # eval/exec
-    if re.search(r"\beval\(|\bexec\(", added):
+    if ("eval(" in added or "exec(" in added) and _EVAL_EXEC.search(added):
         findings.append(_make_finding(
             file, start,
             "Use of eval/exec",
@@ -227,21 +291,20 @@ def py_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # missing docstring heuristic
-    if re.search(r"^\s*def\s+\w+\s*\(.*\):", added, flags=re.MULTILINE):
-        # if next non-empty added line isn't a docstring
-        lines = [l for l in added.splitlines()]
-        for idx, l in enumerate(lines):
-            if re.match(r"^\s*def\s+\w+\s*\(.*\):", l):
-                # look ahead
-                look = "".join(lines[idx+1: idx+4]).strip()
-                if not look.startswith(('"""', "'''")):
-                    findings.append(_make_finding(
-                        file, start + idx,
-                        "Missing docstring for new function",
-                        "It's good practice to add a docstring describing function behavior and parameters.",
-                        "Add a concise docstring (PEP 257) to describe inputs, outputs, and side effects.",
-                        severity="low", confidence=0.6, category="readability", source=["py_agent"]
-                    ))
+    # single walk: if next non-empty added line isn't a docstring
+    lines = added.splitlines()
+    for idx, l in enumerate(lines):
+        if "def" in l and _DEF.match(l):
+            # look ahead
+            look = "".join(lines[idx+1: idx+4]).strip()
+            if not look.startswith(('"""', "'''")):
+                findings.append(_make_finding(
+                    file, start + idx,
+                    "Missing docstring for new function",
+                    "It's good practice to add a docstring describing function behavior and parameters.",
+                    "Add a concise docstring (PEP 257) to describe inputs, outputs, and side effects.",
+                    severity="low", confidence=0.6, category="readability", source=["py_agent"]
+                ))
     return findings
 
 # -------------------------
@@ -250,11 +313,12 @@ def py_agent(hunk: Dict) -> List[Dict]:
 def security_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added_text = "\n".join(hunk.get("added", []))
+    added_text = _hunk_text(hunk)
     start = hunk.get("start", 1)
+    added_lower = added_text.lower()
 
     # Hard-coded secrets
-    if re.search(r"(api_key|apiKey|secret|password)\s*[:=]\s*['\"][A-Za-z0-9_\-]{6,}['\"]", added_text, re.IGNORECASE):
+    if any(k in added_lower for k in _SECRET_KEYWORDS) and _SECRET.search(added_text):
         findings.append(_make_finding(
             file, start,
             "Possible hard-coded secret",
@@ -264,7 +328,7 @@ def security_agent(hunk: Dict) -> List[Dict]:
         ))
 
     # SQL concatenation pattern (naive)
-    if re.search(r"SELECT .* \+ .*", added_text, re.IGNORECASE) or re.search(r"f\".*SELECT.*\{.*\}.*\"", added_text):
+    if "select" in added_lower and _SQL_CONCAT.search(added_text):
         findings.append(_make_finding(
             file, start,
             "Possible SQL concatenation",
@@ -281,13 +345,13 @@ def security_agent(hunk: Dict) -> List[Dict]:
 def performance_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added_text = "\n".join(hunk.get("added", []))
+    added_text = _hunk_text(hunk)
     start = hunk.get("start", 1)
-    lang = detect_language(file)
+    lang = _hunk_lang(hunk)
 
     # repeated DOM queries / heavy loops
-    if lang == "js" and re.search(r"\b(getElementById|querySelector(All)?)\(", added_text):
-        if len(re.findall(r"\b(getElementById|querySelector(All)?)\(", added_text)) > 3:
+    if lang == "js" and ("getElementById" in added_text or "querySelector" in added_text):
+        if len(_DOM_Q.findall(added_text)) > 3:
             findings.append(_make_finding(
                 file, start,
                 "Multiple DOM queries",
@@ -297,7 +361,7 @@ def performance_agent(hunk: Dict) -> List[Dict]:
             ))
 
     # nested loops for python
-    if lang == "py" and re.search(r"for .*:\n\s+for .*:", added_text):
+    if lang == "py" and added_text.count("for ") > 1 and _NESTED.search(added_text):
         findings.append(_make_finding(
             file, start,
             "Potential nested loops",
@@ -346,20 +410,19 @@ def readability_agent(hunk: Dict) -> List[Dict]:
 def tests_agent(hunk: Dict) -> List[Dict]:
     findings = []
     file = hunk.get("file")
-    added_text = "\n".join(hunk.get("added", []))
+    added_text = _hunk_text(hunk)
     start = hunk.get("start", 1)
-    lang = detect_language(file)
+    lang = _hunk_lang(hunk)
 
     # skip if the change is itself a test file
-    if re.search(r"(test_|_test|tests?/)", file, re.IGNORECASE):
+    if _TEST_FILE.search(file):
         return findings
 
     # heuristics for meaningful changes
-    logic_patterns = [r"\bif\b", r"\belse\b", r"\breturn\b", r"\bfor\b", r"\bwhile\b", r"\btry\b", r"\bexcept\b"]
-    contains_logic = any(re.search(p, added_text) for p in logic_patterns)
-    contains_fn = bool(re.search(r"\bdef\s+\w+\(|function\s+\w+|\w+\s*=\s*\(.*\)\s*=>", added_text))
-    contains_db = bool(re.search(r"(cursor\.execute|db\.|insert|update|delete|save\()", added_text, re.IGNORECASE))
-    contains_api = bool(re.search(r"\b(fetch|axios|requests\.)\b", added_text))
+    contains_logic = bool(_LOGIC.search(added_text))
+    contains_fn = bool(_FN.search(added_text))
+    contains_db = bool(_DB.search(added_text))
+    contains_api = bool(_API.search(added_text))
 
     if any([contains_logic, contains_fn, contains_db, contains_api]):
         explanation = []
@@ -385,32 +448,28 @@ def tests_agent(hunk: Dict) -> List[Dict]:
 # -------------------------
 # Public analyzer entrypoint
 # -------------------------
+# agent pipelines, built once per language; language-specific agent runs second
+_BASE_RUNNERS = (syntax_agent, security_agent, performance_agent, readability_agent, tests_agent)
+_RUNNERS_BY_LANG = {
+    "js": (syntax_agent, js_agent, security_agent, performance_agent, readability_agent, tests_agent),
+    "html": (syntax_agent, html_agent, security_agent, performance_agent, readability_agent, tests_agent),
+    "py": (syntax_agent, py_agent, security_agent, performance_agent, readability_agent, tests_agent),
+    # non-code hunks: skip the regex-heavy agents that only produce noise there
+    "md": (readability_agent,),
+    "config": (syntax_agent, security_agent, readability_agent),
+    "css": (syntax_agent, readability_agent),
+}
+
 def analyze_hunk(hunk: Dict) -> List[Dict]:
     """
     Runs language-specific and cross-cutting agents on the provided hunk
     and returns a deduplicated list of findings.
     """
-    file = hunk.get("file", "")
-    lang = detect_language(file)
-
-    runners = [
-        syntax_agent,
-        security_agent,
-        performance_agent,
-        readability_agent,
-        tests_agent
-    ]
-
-    # add language-specific agents
-    if lang == "js":
-        runners.insert(1, js_agent)
-    if lang == "html":
-        runners.insert(1, html_agent)
-    if lang == "py":
-        runners.insert(1, py_agent)
+    # language is memoized on the hunk; agents join the added text lazily
+    lang = _hunk_lang(hunk)
 
     results: List[Dict] = []
-    for r in runners:
+    for r in _RUNNERS_BY_LANG.get(lang, _BASE_RUNNERS):
         try:
             results.extend(r(hunk))
         except Exception:
@@ -418,13 +477,4 @@ def analyze_hunk(hunk: Dict) -> List[Dict]:
             continue
 
     # dedupe by (title, line) while preserving order
-    seen = set()
-    deduped = []
-    for item in results:
-        key = (item.get("issue_title"), item.get("line"))
-        if key in seen:
-            continue
-        seen.add(key)
-        deduped.append(item)
-
-    return deduped
+    return dedupe_findings(results, itemgetter("issue_title", "line"))
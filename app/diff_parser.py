@@ -1,22 +1,108 @@
-from unidiff import PatchSet
-from typing import List, Dict
-
-def parse_hunks_from_patch(text: str) -> List[Dict]:
-    """
-    Parse unified diff into a list of hunks. Each hunk has:
-    { file, hunk_text, added (list), removed (list), start (target_start) }
-    """
-    ps = PatchSet(text.splitlines(keepends=True))
-    hunks = []
-    for patched_file in ps:
-        for hunk in patched_file:
-            added = [line.value.rstrip("\n") for line in hunk if line.is_added]
-            removed = [line.value.rstrip("\n") for line in hunk if line.is_removed]
-            hunks.append({
-                "file": patched_file.path,
-                "hunk_text": str(hunk),
-                "added": added,
-                "removed": removed,
-                "start": hunk.target_start or 1,
-            })
-    return hunks
+import re
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+# @@ -source_start[,source_len] +target_start[,target_len] @@
+_HUNK_HDR = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_DEV_NULL = "/dev/null"
+
+
+def _header_path(line: str, prefix: str) -> str:
+    # "--- a/path\t<timestamp>" -> "path"
+    path = line[4:].split("\t", 1)[0].strip()
+    if path.startswith(prefix):
+        path = path[len(prefix):]
+    return path
+
+
+class _HunkScanner:
+    """
+    Push-style unified diff scanner: feed() one line at a time and get back a
+    hunk dict whenever one completes. Hunk bodies are consumed using the line
+    counts from the @@ header, so "---"/"+++" lines inside a hunk are still
+    treated as removed/added content.
+    """
+
+    def __init__(self) -> None:
+        self.source: Optional[str] = None
+        self.target: Optional[str] = None
+        self.added: List[str] = []
+        self.removed: List[str] = []
+        self.start = 1
+        self.src_left = 0
+        self.tgt_left = 0
+
+    def feed(self, line: str) -> Optional[Dict]:
+        line = line.rstrip("\r\n")
+        if self.src_left > 0 or self.tgt_left > 0:
+            tag = line[:1]
+            if tag == "+":
+                self.added.append(line[1:])
+                self.tgt_left -= 1
+            elif tag == "-":
+                self.removed.append(line[1:])
+                self.src_left -= 1
+            elif tag == "\\":
+                # "\ No newline at end of file"
+                return None
+            else:
+                # context line (an empty line is context with its space stripped)
+                self.src_left -= 1
+                self.tgt_left -= 1
+            if self.src_left <= 0 and self.tgt_left <= 0:
+                return {
+                    "file": self.target if self.source in (None, _DEV_NULL) else self.source,
+                    "added": self.added,
+                    "removed": self.removed,
+                    "start": self.start or 1,
+                }
+            return None
+
+        if line.startswith("--- "):
+            self.source = _header_path(line, "a/")
+        elif line.startswith("+++ "):
+            self.target = _header_path(line, "b/")
+        elif line.startswith("@@"):
+            m = _HUNK_HDR.match(line)
+            if m:
+                self.src_left = int(m.group(2) or 1)
+                self.tgt_left = int(m.group(4) or 1)
+                self.start = int(m.group(3))
+                self.added, self.removed = [], []
+        return None
+
+
+def iter_hunks_from_lines(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse unified diff lines and yield hunks one at a time. Each hunk has:
+    { file, added (list), removed (list), start (target_start) }
+    Lines must be split on "\n" only (a trailing "\r" is stripped).
+    """
+    scanner = _HunkScanner()
+    for line in lines:
+        hunk = scanner.feed(line)
+        if hunk is not None:
+            yield hunk
+
+
+def iter_hunks_from_patch(text: str) -> Iterator[Dict]:
+    """
+    Parse a complete unified diff string; see iter_hunks_from_lines.
+    """
+    # split on "\n" only: str.splitlines() also breaks on \x0c, \x1c-\x1e,
+    # \x85, \u2028 etc., which would desync the @@ line counts
+    lines = text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    return iter_hunks_from_lines(lines)
+
+
+async def aiter_hunks_from_lines(lines: AsyncIterable[str]) -> AsyncIterator[Dict]:
+    """
+    Async variant of iter_hunks_from_lines for streamed diffs: each hunk is
+    yielded as soon as its last line arrives.
+    """
+    scanner = _HunkScanner()
+    async for line in lines:
+        hunk = scanner.feed(line)
+        if hunk is not None:
+            yield hunk
@@ -11,12 +11,13 @@ def format_comment_body(f: Dict) -> str:
     confidence = f.get("confidence", 0.5)
     return f"**{title}**  · *confidence: {confidence:.2f}*\n\n{explanation}\n\n**Suggestion:** {suggestion}"
 
-async def post_review_to_github(owner: str, repo: str, pr_number: int, findings: List[Dict]):
+async def post_review_to_github(client: httpx.AsyncClient, owner: str, repo: str, pr_number: int, findings: List[Dict]):
     """
     Posts a single review containing multiple comments to the PR.
     Note: GitHub expects `position` (diff position) for reviews. Here we use a simple mapping:
     `position = line` as a best-effort approach for small diffs.
     For production you should compute exact diff positions from the patch.
+    `client` is the shared, connection-pooled AsyncClient owned by the app.
     """
     if not GITHUB_TOKEN:
         raise RuntimeError("GITHUB_TOKEN not set")
@@ -41,7 +42,6 @@ async def post_review_to_github(owner: str, repo: str, pr_number: int, findings:
         "Accept": "application/vnd.github+json"
     }
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(url, json=payload, headers=headers, timeout=30.0)
-        r.raise_for_status()
-        return r.json()
+    r = await client.post(url, json=payload, headers=headers, timeout=30.0)
+    r.raise_for_status()
+    return r.json()
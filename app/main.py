@@ -1,17 +1,52 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from contextlib import aclosing, asynccontextmanager
+import hashlib
+import httpx
+import itertools
 import os
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
-from .pr_fetcher import fetch_pr_diff
-from .diff_parser import parse_hunks_from_patch
-from .orchestrator import analyze_hunks
+from .pr_fetcher import aiter_diff_lines, open_pr_diff
+from .diff_parser import aiter_hunks_from_lines, iter_hunks_from_patch
+from .orchestrator import analyze_hunk_stream, analyze_hunks, shutdown_pool, start_pool
 from .github_post import post_review_to_github
 
 load_dotenv()
 
-app = FastAPI(title="Gemini PR Reviewer")
+# findings keyed by patch digest; oldest entry evicted once full
+FINDINGS_CACHE_SIZE = 128
+_FINDINGS_CACHE: Dict[str, List[Dict]] = {}
+# GitHub PR findings keyed by (owner, repo, pr_number) -> (diff ETag, findings)
+_PR_CACHE: Dict[Tuple[str, str, int], Tuple[str, List[Dict]]] = {}
+
+
+def _cache_put(cache: Dict, key, value) -> None:
+    if key not in cache and len(cache) >= FINDINGS_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    cache[key] = value
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # analysis process pool first (workers must not inherit the client's
+    # sockets), then one pooled HTTP/2 client for all GitHub calls; both are
+    # closed on shutdown
+    start_pool()
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        headers={"Accept": "application/vnd.github+json"},
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        shutdown_pool()
+
+
+app = FastAPI(title="Gemini PR Reviewer", lifespan=lifespan)
 
 
 class PRRequest(BaseModel):
@@ -21,35 +56,81 @@ class PRRequest(BaseModel):
     diff_text: Optional[str] = None
 
 
+async def _findings_for_patch(patch_text: str) -> Optional[List[Dict]]:
+    """
+    Analyze a unified diff, reusing cached findings for identical patches.
+    Returns None when the patch contains no hunks.
+    """
+    # surrogatepass: JSON may carry lone surrogates (e.g. "\ud800") that strict utf-8 rejects
+    key = hashlib.blake2b(patch_text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    cached = _FINDINGS_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    hunks = iter_hunks_from_patch(patch_text)
+    first = next(hunks, None)
+    if first is None:
+        return None
+
+    findings, failed = await analyze_hunks(itertools.chain((first,), hunks))
+    if failed:
+        # partial result: don't pin it in the cache for later retries
+        return findings
+    _cache_put(_FINDINGS_CACHE, key, findings)
+    return findings
+
+
+async def _findings_for_pr(client: httpx.AsyncClient, owner: str, repo: str, pr_number: int) -> Optional[List[Dict]]:
+    """
+    Stream a PR diff from GitHub and analyze hunks while it downloads.
+    Findings are cached per PR under the diff's ETag; when GitHub answers
+    If-None-Match with 304 the cached findings are returned as-is.
+    Returns None when the diff contains no hunks.
+    """
+    key = (owner, repo, pr_number)
+    cached = _PR_CACHE.get(key)
+    async with open_pr_diff(client, owner, repo, pr_number, etag=cached[0] if cached else None) as r:
+        if r.status_code == 304 and cached is not None:
+            return cached[1]
+        etag = r.headers.get("ETag")
+        # aclosing releases the line generator even if analysis raises
+        async with aclosing(aiter_diff_lines(r)) as lines:
+            streamed = await analyze_hunk_stream(aiter_hunks_from_lines(lines))
+
+    if streamed is None:
+        return None
+    findings, failed = streamed
+    if etag and not failed:
+        _cache_put(_PR_CACHE, key, (etag, findings))
+    return findings
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
 @app.post("/review-pr")
-async def review_pr(req: PRRequest):
+async def review_pr(req: PRRequest, request: Request):
     """
     Accept either:
       - { owner, repo, pr_number }  --> fetches PR diff from GitHub
       - { diff_text }               --> use provided unified diff
     """
     if req.diff_text:
-        patch_text = req.diff_text
+        findings = await _findings_for_patch(req.diff_text)
     else:
         if not (req.owner and req.repo and req.pr_number):
             raise HTTPException(status_code=400, detail="owner, repo, pr_number OR diff_text required")
-        patch_text = await fetch_pr_diff(req.owner, req.repo, int(req.pr_number))
+        findings = await _findings_for_pr(request.app.state.http, req.owner, req.repo, int(req.pr_number))
 
-    hunks = parse_hunks_from_patch(patch_text)
-    if not hunks:
+    if findings is None:
         return {"count": 0, "findings": [], "message": "no changes detected"}
 
-    findings = await analyze_hunks(hunks)
-
     posted = None
     if all([req.owner, req.repo, req.pr_number]) and os.getenv("GITHUB_TOKEN"):
         try:
-            posted = await post_review_to_github(req.owner, req.repo, int(req.pr_number), findings)
+            posted = await post_review_to_github(request.app.state.http, req.owner, req.repo, int(req.pr_number), findings)
         except Exception as e:
             posted = {"error": str(e)}
 
@@ -61,6 +142,5 @@ async def review_diff(payload: dict):
     diff_text = payload.get("diff_text")
     if not diff_text:
         raise HTTPException(status_code=400, detail="diff_text required")
-    hunks = parse_hunks_from_patch(diff_text)
-    findings = await analyze_hunks(hunks)
+    findings = await _findings_for_patch(diff_text) or []
     return {"count": len(findings), "findings": findings}
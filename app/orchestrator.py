@@ -1,35 +1,147 @@
 # app/orchestrator.py
 import asyncio
-from typing import List, Dict
-from .agents import analyze_hunk
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from operator import itemgetter
+from typing import AsyncIterable, AsyncIterator, Deque, Iterable, List, Dict, Optional, Tuple
+from .agents import analyze_hunk, dedupe_findings
 
-# concurrency limit
-CONCURRENCY = 6
+# analyze_hunk is CPU-bound regex work; a process pool sidesteps the GIL
+# and its worker count bounds concurrency. Started from the app lifespan,
+# created lazily otherwise, replaced if broken.
+_POOL: Optional[ProcessPoolExecutor] = None
 
-async def _run_hunk(hunk: Dict) -> List[Dict]:
+# hunks per pool task; one analyze_hunk call is ~85us, far below the
+# pickle/IPC cost of a task, so work is shipped to workers in batches
+HUNK_BATCH_SIZE = 64
+
+_SEVERITY_RANK = {"high": 0, "medium": 1, "low": 2}
+
+# batches submitted but not yet finished; keeps only a window of the PR in memory
+MAX_IN_FLIGHT = 2 * (os.cpu_count() or 1)
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        # forkserver workers don't inherit the server's sockets/HTTP client fds
+        ctx = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("forkserver")
+        _POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=ctx)
+    return _POOL
+
+def start_pool() -> None:
+    """
+    Create the analysis process pool up front; called from the app lifespan.
+    """
+    _get_pool()
+
+def _replace_broken_pool(broken: ProcessPoolExecutor) -> None:
+    # a worker died (OOM, kill); every later submit would fail, so start fresh
+    global _POOL
+    if _POOL is broken:
+        _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_pool() -> None:
+    """
+    Shut down the analysis process pool; called from the app lifespan.
+    """
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=True, cancel_futures=True)
+        _POOL = None
+
+def _analyze_batch(hunks: List[Dict]) -> List[Optional[List[Dict]]]:
+    # runs inside a pool worker; None marks a hunk that could not be analyzed
+    # (distinct from "no findings")
+    results: List[Optional[List[Dict]]] = []
+    for h in hunks:
+        try:
+            results.append(analyze_hunk(h))
+        except Exception:
+            results.append(None)
+    return results
+
+async def _run_batch(batch: List[Dict]) -> List[Optional[List[Dict]]]:
     loop = asyncio.get_running_loop()
-    # analyze_hunk is synchronous, run in executor
-    return await loop.run_in_executor(None, analyze_hunk, hunk)
+    pool = _get_pool()
+    # analysis is synchronous, run in executor
+    try:
+        return await loop.run_in_executor(pool, _analyze_batch, batch)
+    except BrokenProcessPool:
+        # retry once on a fresh pool; a second failure propagates (5xx)
+        _replace_broken_pool(pool)
+        return await loop.run_in_executor(_get_pool(), _analyze_batch, batch)
+
+async def _worker(batch: List[Dict]) -> List[Optional[List[Dict]]]:
+    try:
+        return await _run_batch(batch)
+    except BrokenProcessPool:
+        # not a per-hunk problem: don't report it as "no findings"
+        raise
+    except Exception:
+        # e.g. the batch could not be pickled: every hunk in it failed
+        return [None] * len(batch)
+
+async def _aiter(hunks: Iterable[Dict]) -> AsyncIterator[Dict]:
+    for h in hunks:
+        yield h
 
-async def analyze_hunks(hunks: List[Dict]) -> List[Dict]:
+async def _run_window(hunks: AsyncIterable[Dict]) -> List[Optional[List[Dict]]]:
+    # group hunks into HUNK_BATCH_SIZE batches as they arrive, keeping at most
+    # MAX_IN_FLIGHT batches pending; results are collected in submission order
+    # so dedupe stays stable
+    window: Deque[asyncio.Future] = deque()
+    nested: List[Optional[List[Dict]]] = []
+    batch: List[Dict] = []
+    try:
+        async for h in hunks:
+            batch.append(h)
+            if len(batch) < HUNK_BATCH_SIZE:
+                continue
+            if len(window) >= MAX_IN_FLIGHT:
+                nested.extend(await window.popleft())
+            window.append(asyncio.ensure_future(_worker(batch)))
+            batch = []
+        if batch:
+            window.append(asyncio.ensure_future(_worker(batch)))
+        while window:
+            nested.extend(await window.popleft())
+    except BaseException:
+        for t in window:
+            t.cancel()
+        raise
+    return nested
+
+async def analyze_hunks(hunks: Iterable[Dict]) -> Tuple[List[Dict], int]:
     """
-    Run analyze_hunk on all hunks concurrently (bounded concurrency).
+    Run analyze_hunk on all hunks in pool-sized batches (bounded by MAX_IN_FLIGHT).
     Merge results, deduplicate globally and sort by severity.
+    Returns (findings, number of hunks that failed to analyze).
     """
-    sem = asyncio.Semaphore(CONCURRENCY)
+    return _merge(await _run_window(_aiter(hunks)))
 
-    async def worker(h):
-        async with sem:
-            try:
-                return await _run_hunk(h)
-            except Exception:
-                return []
+async def analyze_hunk_stream(hunks: AsyncIterable[Dict]) -> Optional[Tuple[List[Dict], int]]:
+    """
+    Like analyze_hunks, but for hunks produced while the diff is still
+    downloading: hunks are batched and submitted to the pool as they arrive,
+    overlapping network I/O with analysis.
+    Returns (findings, failed hunk count), or None when the stream yields no hunks.
+    """
+    nested = await _run_window(hunks)
+    if not nested:
+        return None
+    return _merge(nested)
 
-    tasks = [worker(h) for h in hunks]
-    nested = await asyncio.gather(*tasks)
+def _merge(nested: List[Optional[List[Dict]]]) -> Tuple[List[Dict], int]:
+    failed = sum(1 for sub in nested if sub is None)
 
     # flatten
-    flat = [item for sub in nested for item in sub]
+    flat = [item for sub in nested if sub is not None for item in sub]
 
     # normalize fields and ensure hunk_text exists
     for it in flat:
@@ -38,17 +150,11 @@ async def analyze_hunks(hunks: List[Dict]) -> List[Dict]:
         it.setdefault("hunk_text", it.get("hunk_text", ""))
 
     # global dedupe by (file, line, title)
-    seen = set()
-    deduped = []
-    for it in flat:
-        key = (it.get("file"), it.get("line"), it.get("issue_title"))
-        if key in seen:
-            continue
-        seen.add(key)
-        deduped.append(it)
+    deduped = dedupe_findings(flat, itemgetter("file", "line", "issue_title"))
 
-    # sort by severity (high->medium->low) then confidence desc
-    severity_rank = {"high": 0, "medium": 1, "low": 2}
-    deduped.sort(key=lambda x: (severity_rank.get(x.get("severity", "low"), 2), -float(x.get("confidence", 0))))
+    # sort by severity (high->medium->low) then confidence desc; the key is
+    # computed once per finding (confidence is already a float from _make_finding)
+    rank = _SEVERITY_RANK.get
+    deduped.sort(key=lambda x: (rank(x["severity"], 2), -x["confidence"]))
 
-    return deduped
+    return deduped, failed
@@ -1,19 +1,53 @@
 import httpx
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 
-async def fetch_pr_diff(owner: str, repo: str, pr_number: int) -> str:
+@asynccontextmanager
+async def open_pr_diff(client: httpx.AsyncClient, owner: str, repo: str, pr_number: int,
+                       etag: Optional[str] = None) -> AsyncIterator[httpx.Response]:
     """
-    Fetch unified diff for a PR using GitHub API.
+    Open a streamed GitHub API request for a PR's unified diff, so parsing
+    and analysis can start before the download finishes.
+    `client` is the shared, connection-pooled AsyncClient owned by the app.
+    With `etag`, sends If-None-Match: a 304 response means the diff is
+    unchanged (and does not count against the rate limit).
     """
     url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
     headers = {"Accept": "application/vnd.github.v3.diff"}
     if GITHUB_TOKEN:
         headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    if etag:
+        headers["If-None-Match"] = etag
 
-    async with httpx.AsyncClient() as client:
-        r = await client.get(url, headers=headers, timeout=30.0)
-        r.raise_for_status()
-        return r.text
+    async with client.stream("GET", url, headers=headers, timeout=30.0) as r:
+        if r.status_code != 304:
+            r.raise_for_status()
+        yield r
+
+
+async def aiter_diff_lines(r: httpx.Response) -> AsyncIterator[str]:
+    """
+    Yield the lines of a streamed diff response.
+    """
+    # split on "\n" only (aiter_lines also breaks on \r, \x0c, \u2028 ...,
+    # which would desync the @@ line counts in the diff scanner)
+    # only the new chunk is split; an unfinished line is kept as a list of
+    # pieces and joined once, so very long lines stay linear
+    tail: List[str] = []
+    async for chunk in r.aiter_text():
+        parts = chunk.split("\n")
+        if len(parts) == 1:
+            tail.append(chunk)
+            continue
+        tail.append(parts[0])
+        yield "".join(tail)
+        for line in parts[1:-1]:
+            yield line
+        tail = [parts[-1]]
+    last = "".join(tail)
+    if last:
+        yield last